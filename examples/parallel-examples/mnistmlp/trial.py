@@ -1,11 +1,20 @@
+# Requires TensorFlow 2.6 or later for the Rescaling layer,
+# tf.data.AUTOTUNE and jit_compile in Model.compile. The optimizer uses a
+# learning rate schedule since SGD no longer takes decay in TF 2.11+.
 from __future__ import print_function
 import os
-os.environ['CUDA_VISIBLE_DEVICES'] = ''
+# GPU handed out by the scheduler (see LocalScheduler resources), it is
+# released by the scheduler once this process exits, however it exits.
+os.environ['CUDA_VISIBLE_DEVICES'] = os.environ.get('SHERPA_RESOURCE', '')
+import tensorflow as tf
+# allocate GPU memory as needed so several trials can share one card
+for gpu in tf.config.list_physical_devices('GPU'):
+    tf.config.experimental.set_memory_growth(gpu, True)
 import sherpa
-import keras
 from keras.models import Model
-from keras.layers import Dense, Input, Dropout
+from keras.layers import Dense, Input, Dropout, Rescaling
 from keras.optimizers import SGD
+from keras.optimizers.schedules import InverseTimeDecay
 from keras.datasets import mnist
 
 
@@ -19,8 +28,8 @@ def define_model(params):
     init = 'glorot_normal'
     arch = params.get('arch', [100, 100])
     dropout = params.get('dropout')
-    input = Input(shape=(nin,), dtype='float32', name='input')
-    x = input
+    input = Input(shape=(nin,), dtype='uint8', name='input')
+    x = Rescaling(1. / 255.)(input)
     for units in arch:
         x = Dense(units, kernel_initializer=init, activation=act)(x)
         if dropout:
@@ -32,46 +41,53 @@ def define_model(params):
     lrinit = params.get('lrinit', 0.02)
     momentum = params.get('momentum', 0.7)
     lrdecay = params.get('lrdecay', 0.)
-    loss = {'output':'categorical_crossentropy'}
+    loss = {'output':'sparse_categorical_crossentropy'}
     metrics = {'output':'accuracy'}
     loss_weights = {'output':1.0}
-    optimizer = SGD(lr=lrinit, momentum=momentum, decay=lrdecay)
-    model.compile(optimizer=optimizer, loss=loss, metrics=metrics, loss_weights=loss_weights)
+    # lrinit / (1 + lrdecay * step), the schedule of the former decay argument
+    learning_rate = InverseTimeDecay(lrinit, decay_steps=1, decay_rate=lrdecay)
+    optimizer = SGD(learning_rate=learning_rate, momentum=momentum,
+                    nesterov=True)
+    model.compile(optimizer=optimizer, loss=loss, metrics=metrics,
+                  loss_weights=loss_weights, jit_compile=True)
     return model
 
 
 def main(client, trial):
     batch_size = 32
-    num_classes = 10
     epochs = trial.parameters.get('epochs', 15)
 
     # the data, shuffled and split between train and test sets
     (x_train, y_train), (x_test, y_test) = mnist.load_data()
 
+    # inputs stay uint8, the model rescales them (see define_model)
     x_train = x_train.reshape(60000, 784)
     x_test = x_test.reshape(10000, 784)
-    x_train = x_train.astype('float32')
-    x_test = x_test.astype('float32')
-    x_train /= 255
-    x_test /= 255
     print(x_train.shape[0], 'train samples')
     print(x_test.shape[0], 'test samples')
 
-    # convert class vectors to binary class matrices
-    y_train = keras.utils.to_categorical(y_train, num_classes)
-    y_test = keras.utils.to_categorical(y_test, num_classes)
+    # input pipelines: shuffle/batch on the host while the model trains
+    AUTOTUNE = tf.data.AUTOTUNE
+    ds_train = tf.data.Dataset.from_tensor_slices((x_train, y_train)) \
+                              .cache() \
+                              .shuffle(x_train.shape[0]) \
+                              .batch(batch_size) \
+                              .prefetch(AUTOTUNE)
+    ds_test = tf.data.Dataset.from_tensor_slices((x_test, y_test)) \
+                             .batch(batch_size) \
+                             .cache() \
+                             .prefetch(AUTOTUNE)
 
     # Create new model.
     model = define_model(trial.parameters)
 
-    model.fit(x_train, y_train,
-              batch_size=batch_size,
+    model.fit(ds_train,
               epochs=epochs,
               verbose=2,
               callbacks=[client.keras_send_metrics(trial,
                                                    objective_name='val_loss',
-                                                   context_names=['val_acc'])],
-              validation_data=(x_test, y_test))
+                                                   context_names=['val_accuracy'])],
+              validation_data=ds_test)
 
 
 if __name__=='__main__':
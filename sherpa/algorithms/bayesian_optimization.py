@@ -2,6 +2,7 @@ import numpy
 import logging
 import sherpa
 from sherpa.algorithms import Algorithm
+from sherpa.algorithms.core import _get_completed
 import pandas
 from sherpa.core import Choice, Continuous, Discrete, Ordinal
 import collections
@@ -50,6 +51,7 @@ class GPyOpt(Algorithm):
         max_num_trials (int): maximum number of trials to run for.
     """
     allows_repetition = True
+    warm_start_num_data_points = 20
 
     def __init__(self, model_type='GP', num_initial_data_points='infer',
                  initial_data_points=[], acquisition_type='EI',
@@ -76,6 +78,17 @@ class GPyOpt(Algorithm):
 
         self.domain = []
 
+        # design matrix rows of trials seen so far, grown incrementally
+        self._X = None
+        self._X_trial_ids = None
+
+        # fitted GP kernel of the last batch, used to warm-start the next fit
+        self._kernel = None
+
+        # best predicted configuration and the data it was computed from
+        self._best_pred = None
+        self._best_pred_key = None
+
         self.max_num_trials = max_num_trials
         self.count = 0
 
@@ -105,7 +118,7 @@ class GPyOpt(Algorithm):
             # clear previous batch since new data is available
             self.next_trials.clear()
 
-            X, y, y_var = self._prepare_data_for_bayes_opt(parameters, results)
+            X, y, y_var = self._get_data_for_bayes_opt(parameters, results)
 
             domain = self._initialize_domain(parameters)
             batch = self._generate_bayesopt_batch(X, y, lower_is_better, domain)
@@ -126,7 +139,7 @@ class GPyOpt(Algorithm):
 
     @classmethod
     def _num_completed_trials(cls, results):
-        return (len(results.query("Status == 'COMPLETED'"))
+        return (len(_get_completed(results))
                 if results is not None and len(results) > 0 else 0)
 
     def _generate_bayesopt_batch(self, X, y, lower_is_better, domain):
@@ -140,19 +153,40 @@ class GPyOpt(Algorithm):
                                                               verbosity=self.verbosity,
                                                               maximize=False,
                                                               exact_feval=False,
-                                                              model_type=self.model_type)
-        return bo_step.suggest_next_locations()
+                                                              model_type=self.model_type,
+                                                              **self._get_model_options(len(X)))
+        next_locations = bo_step.suggest_next_locations()
+        if self.model_type == 'GP':
+            self._kernel = bo_step.model.model.kern.copy()
+        return next_locations
+
+    def _get_model_options(self, num_data_points):
+        """
+        Once enough data points have been seen the GP hyperparameters change
+        little between batches. The model is then initialized with the kernel
+        fitted on the previous batch and optimized once instead of from
+        several random restarts.
+        """
+        if (self.model_type != 'GP' or self._kernel is None
+                or num_data_points < self.warm_start_num_data_points):
+            return {}
+        return {'kernel': self._kernel.copy(), 'optimize_restarts': 1}
 
     def get_best_pred(self, parameters, results, lower_is_better):
         if self._num_completed_trials(results) >= self._num_initial_data_points:
-            X, y, y_var = self._prepare_data_for_bayes_opt(parameters, results)
-
-            domain = self._initialize_domain(parameters)
-            best_pred = self._generate_best_predicted(X, y, lower_is_better, domain)
-
-            list_of_dict = self._reverse_to_sherpa_format(best_pred,
-                                                                 parameters)
-            return list_of_dict[0]
+            X, y, y_var = self._get_data_for_bayes_opt(parameters, results)
+
+            # refitting the model is only needed if the data has changed
+            key = (X.tobytes(), y.tobytes(), lower_is_better)
+            if key != self._best_pred_key:
+                domain = self._initialize_domain(parameters)
+                best_pred = self._generate_best_predicted(X, y,
+                                                          lower_is_better,
+                                                          domain)
+                self._best_pred = self._reverse_to_sherpa_format(best_pred,
+                                                                 parameters)[0]
+                self._best_pred_key = key
+            return dict(self._best_pred)
         else:
             return {}
 
@@ -205,7 +239,7 @@ class GPyOpt(Algorithm):
         initial_data_points.
         """
         if isinstance(initial_data_points, pandas.DataFrame):
-            _initial_data_points = list(initial_data_points.T.to_dict().values())
+            _initial_data_points = initial_data_points.to_dict('records')
         else:
             _initial_data_points = initial_data_points
 
@@ -217,27 +251,70 @@ class GPyOpt(Algorithm):
 
         return _initial_data_points
 
+    def _get_data_for_bayes_opt(self, parameters, results):
+        """
+        Same as ``_prepare_data_for_bayes_opt`` but only transforms the rows
+        of trials that completed since the last call. The cached rows are
+        rebuilt if the previously seen trials are not a prefix of the
+        completed trials anymore, e.g. for aggregated results.
+        """
+        completed = _get_completed(results)
+
+        if 'Trial-ID' in completed.columns:
+            trial_ids = completed['Trial-ID'].values
+            num_cached = 0 if self._X is None else len(self._X)
+            if (num_cached > len(trial_ids)
+                    or not numpy.array_equal(trial_ids[:num_cached],
+                                             self._X_trial_ids)):
+                num_cached = 0
+            X_new = self._get_design_matrix(parameters,
+                                            completed.iloc[num_cached:])
+            self._X = (numpy.vstack([self._X, X_new]) if num_cached > 0
+                       else X_new)
+            self._X_trial_ids = trial_ids
+            X = self._X
+        else:
+            X = self._get_design_matrix(parameters, completed)
+
+        y, y_var = self._get_objective_values(completed)
+        return X, y, y_var
+
     @staticmethod
     def _prepare_data_for_bayes_opt(parameters, results):
         """
         Turn historical data from Sherpa results dataframe into design matrix
         X and objective values y to be consumed by GPyOpt.
         """
-        completed = results.query("Status == 'COMPLETED'")
+        completed = _get_completed(results)
+        X = GPyOpt._get_design_matrix(parameters, completed)
+        y, y_var = GPyOpt._get_objective_values(completed)
+        return X, y, y_var
 
+    @staticmethod
+    def _get_design_matrix(parameters, completed):
+        """
+        Turn parameter columns of completed results into GPyOpt design format.
+        """
         X = numpy.zeros((len(completed), len(parameters)))
         for i, p in enumerate(parameters):
             transform = ParameterTransform.from_parameter(p)
             historical_data = completed[p.name]
             X[:, i] = transform.sherpa_format_to_gpyopt_design_format(
                 historical_data)
+        return X
 
+    @staticmethod
+    def _get_objective_values(completed):
+        """
+        Objective values and, if available, their standard errors as column
+        vectors.
+        """
         y = numpy.array(completed.Objective).reshape((-1, 1))
         if 'ObjectiveStdErr' in completed.columns:
             y_var = numpy.array(completed.ObjectiveStdErr).reshape((-1, 1))
         else:
             y_var = None
-        return X, y, y_var
+        return y, y_var
 
     @staticmethod
     def _initialize_domain(parameters):
@@ -256,12 +333,13 @@ class GPyOpt(Algorithm):
         Turn design matrix from GPyOpt back into a list of dictionaries with
         Sherpa-style parameters.
         """
-        col_dict = {}
+        columns = []
         for i, p in enumerate(parameters):
             transform = ParameterTransform.from_parameter(p)
-            col_dict[p.name] = transform.gpyopt_design_format_to_list_in_sherpa_format(X_next[:, i])
+            columns.append(transform.gpyopt_design_format_to_list_in_sherpa_format(X_next[:, i]))
 
-        return list(pandas.DataFrame(col_dict).T.to_dict().values())
+        names = [p.name for p in parameters]
+        return [dict(zip(names, row)) for row in zip(*columns)]
 
 
 class ParameterTransform(object):
@@ -343,7 +421,20 @@ class ChoiceTransform(ParameterTransform):
         return [self.parameter.range[int(elem)] for elem in x]
 
     def sherpa_format_to_gpyopt_design_format(self, x):
-        return [self.parameter.range.index(elem) for elem in x]
+        values = self.parameter.range
+        try:
+            unique = len(set(values)) == len(values)
+        except TypeError:
+            unique = False
+        if not unique:
+            # unhashable (e.g. list-valued) or repeated range values
+            return [values.index(elem) for elem in x]
+
+        indices = pandas.Index(values, tupleize_cols=False).get_indexer(x)
+        if (indices == -1).any():
+            raise ValueError("Value not in range of parameter "
+                             "{}.".format(self.parameter.name))
+        return indices
 
 
 class DiscreteTransform(ParameterTransform):
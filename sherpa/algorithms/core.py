@@ -18,7 +18,7 @@ You should have received a copy of the GNU General Public License
 along with SHERPA.  If not, see <http://www.gnu.org/licenses/>.
 """
 import os
-import random
+import weakref
 import numpy
 import logging
 import sherpa
@@ -33,6 +33,86 @@ import collections
 alglogger = logging.getLogger(__name__)
 
 
+# weak reference to the results DataFrame last passed to _get_completed,
+# its length and its completed rows
+_completed_cache = None
+
+
+def _get_completed(results):
+    """
+    Returns the rows of ``results`` with status COMPLETED.
+
+    The rows of the last ``results`` DataFrame are kept since the same
+    DataFrame is queried several times per suggestion, e.g. by Repeat and the
+    wrapped algorithm. Only a weak reference to ``results`` is held, so the
+    cache does not keep old results tables alive. The returned DataFrame must
+    not be modified.
+    """
+    global _completed_cache
+    if (_completed_cache is None or _completed_cache[0]() is not results
+            or _completed_cache[1] != len(results)):
+        _completed_cache = (weakref.ref(results), len(results),
+                            results.query("Status == 'COMPLETED'"))
+    return _completed_cache[2]
+
+
+def _shuffled(values):
+    """
+    Returns the items of ``values`` in random order drawn from the sherpa RNG.
+    """
+    return [values[i] for i in sherpa_rng.permutation(len(values))]
+
+
+def _clip(value, lower, upper):
+    """
+    Clips a scalar to [lower, upper] without going through numpy.clip. A
+    clipped value keeps its type if the bound can be represented in it
+    exactly, e.g. a float clipped to an integer bound stays a float, while
+    an int clipped to a fractional bound becomes that bound.
+    """
+    if value < lower:
+        bound = lower
+    elif value > upper:
+        bound = upper
+    else:
+        return value
+    converted = type(value)(bound)
+    return converted if converted == bound else bound
+
+
+def _get_bounds(cache, name, values):
+    """
+    Returns the lower and upper bound of a parameter range. The bounds are
+    computed once per parameter name and kept in ``cache``.
+    """
+    if name not in cache:
+        cache[name] = (min(values), max(values))
+    return cache[name]
+
+
+def _get_ordinal_position(cache, name, values, value):
+    """
+    Returns the position of ``value`` in an Ordinal range, like
+    ``values.index(value)``. A dict mapping the values to their positions is
+    built once per parameter name and kept in ``cache``. Ranges with
+    unhashable values, e.g. lists, are searched with ``values.index``.
+    """
+    if name not in cache:
+        index = {}
+        try:
+            for i, v in enumerate(values):
+                index.setdefault(v, i)
+        except TypeError:
+            index = None
+        cache[name] = index
+    index = cache[name]
+    try:
+        return index[value]
+    except (KeyError, TypeError):
+        # raises ValueError if value is not in the range
+        return values.index(value)
+
+
 class Algorithm(object):
     """
     Abstract algorithm that generates new set of parameters.
@@ -132,7 +212,7 @@ class Repeat(Algorithm):
     def get_suggestion(self, parameters, results=None, lower_is_better=True):
         if len(self.queue) == 0:
             if results is not None and len(results) > 0:
-                completed = results.query("Status == 'COMPLETED'")
+                completed = _get_completed(results)
                 if (self.wait_for_completion and len(
                         completed) < self.prev_completed + self.num_times):
                     return AlgorithmState.WAIT
@@ -394,10 +474,13 @@ class LocalSearch(Algorithm):
     def __init__(self, seed_configuration, perturbation_factors=(0.8, 1.2), repeat_trials=1):
         self.seed_configuration = seed_configuration
         self.count = 0
-        self.submitted = []
+        self.submitted = set()
+        self._submitted_unhashable = []
         self.perturbation_factors = perturbation_factors
         self.next_trial = []
         self.repeat_trials = repeat_trials
+        self._ordinal_index = {}
+        self._bounds = {}
         
     def get_suggestion(self, parameters, results, lower_is_better):
         if not self.next_trial:
@@ -409,42 +492,61 @@ class LocalSearch(Algorithm):
     def _get_next_trials(self, parameters, results, lower_is_better):
         self.count += 1
         if self.count == 1:
-            self.submitted.append(self.seed_configuration)
+            self._add_submitted(self.seed_configuration)
             return [self.seed_configuration] * self.repeat_trials
 
         # Get best result so far
         if len(results) > 0:
-            completed = results.query("Status == 'COMPLETED'")
+            completed = _get_completed(results)
             if len(completed) > 0:
                 best_idx = (completed.loc[:, 'Objective'].idxmin() if lower_is_better
                             else completed.loc[:, 'Objective'].idxmax())
-                self.seed_configuration = completed.loc[
-                    best_idx, [p.name for p in parameters]].to_dict()
+                self.seed_configuration = {p.name: completed.at[best_idx,
+                                                                p.name]
+                                           for p in parameters}
 
         # Randomly sample perturbations and return first that hasn't been tried
-        for param in random.sample(parameters, len(parameters)):
+        for param in _shuffled(parameters):
             if isinstance(param, Choice):
-                values = random.sample(param.range,
-                                       len(param.range))
+                values = _shuffled(param.range)
                 for val in values:
                     new_params = self.seed_configuration.copy()
                     new_params[param.name] = val
-                    if new_params not in self.submitted:
-                        self.submitted.append(new_params)
+                    if self._add_submitted(new_params):
                         return [new_params] * self.repeat_trials
             else:
-                for incr in random.sample([True, False], 2):
+                for incr in _shuffled([True, False]):
                     new_params = self._perturb(candidate=self.seed_configuration.copy(),
                                                parameter=param,
                                                increase=incr)
-                    if new_params not in self.submitted:
-                        self.submitted.append(new_params)
+                    if self._add_submitted(new_params):
                         return [new_params] * self.repeat_trials
         else:
             alglogger.info("All local perturbations have been exhausted and "
                            "no better local optimum was found.")
             return [None] * self.repeat_trials
 
+    def _add_submitted(self, configuration):
+        """
+        Records a configuration as submitted.
+
+        Returns:
+            bool: False if the configuration had already been submitted.
+        """
+        try:
+            key = frozenset(configuration.items())
+        except TypeError:
+            # unhashable values, e.g. list-valued Choices, are compared
+            # one by one
+            if configuration in self._submitted_unhashable:
+                return False
+            self._submitted_unhashable.append(configuration)
+            return True
+        if key in self.submitted:
+            return False
+        self.submitted.add(key)
+        return True
+
     def _perturb(self, candidate, parameter, increase):
         """
         Randomly choose one parameter and perturb it.
@@ -464,8 +566,10 @@ class LocalSearch(Algorithm):
         if isinstance(parameter, Ordinal):
             shift = +1 if increase else -1
             values = parameter.range
-            newidx = values.index(candidate[parameter.name]) + shift
-            newidx = numpy.clip(newidx, 0, len(values) - 1)
+            newidx = _get_ordinal_position(self._ordinal_index, parameter.name,
+                                           values,
+                                           candidate[parameter.name]) + shift
+            newidx = _clip(newidx, 0, len(values) - 1)
             candidate[parameter.name] = values[newidx]
 
         else:
@@ -475,9 +579,10 @@ class LocalSearch(Algorithm):
             if isinstance(parameter, Discrete):
                 candidate[parameter.name] = int(candidate[parameter.name])
 
-            candidate[parameter.name] = numpy.clip(candidate[parameter.name],
-                                               min(parameter.range),
-                                               max(parameter.range))
+            lower, upper = _get_bounds(self._bounds, parameter.name,
+                                       parameter.range)
+            candidate[parameter.name] = _clip(candidate[parameter.name],
+                                              lower, upper)
         return candidate
 
 
@@ -525,6 +630,9 @@ class MedianStoppingRule(StoppingRule):
     def __init__(self, min_iterations=0, min_trials=1):
         self.min_iterations = min_iterations
         self.min_trials = min_trials
+        self._summary_results = None
+        self._summary_len = 0
+        self._summary = None
 
     def should_trial_stop(self, trial, results, lower_is_better):
         """
@@ -538,36 +646,29 @@ class MedianStoppingRule(StoppingRule):
         """
         if len(results) == 0:
             return False
-        
-        trial_rows = results.loc[results['Trial-ID'] == trial.id]
-        
-        max_iteration = trial_rows['Iteration'].max()
-        if max_iteration < self.min_iterations:
-            return False
-        
-        trial_obj_val = trial_rows['Objective'].min() if lower_is_better else trial_rows['Objective'].max()
 
-        if numpy.isnan(trial_obj_val) and not trial_rows.empty:
-            alglogger.debug("Value {} is NaN: {}, trial rows: {}".format(trial_obj_val, numpy.isnan(trial_obj_val), trial_rows))
-            return True
+        max_iterations, min_objectives, max_objectives = \
+            self._get_trial_summary(results)
+        best_objectives = min_objectives if lower_is_better else max_objectives
+
+        if trial.id not in max_iterations.index:
+            return False
 
-        other_trial_ids = set(results['Trial-ID']) - {trial.id}
-        comparison_vals = []
+        if max_iterations[trial.id] < self.min_iterations:
+            return False
 
-        for tid in other_trial_ids:
-            trial_rows = results.loc[results['Trial-ID'] == tid]
-            
-            max_iteration = trial_rows['Iteration'].max()
-            if max_iteration < self.min_iterations:
-                continue
+        trial_obj_val = best_objectives[trial.id]
 
-            valid_rows = trial_rows.loc[trial_rows['Iteration'] <= max_iteration]
-            obj_val = valid_rows['Objective'].min() if lower_is_better else valid_rows['Objective'].max()
-            comparison_vals.append(obj_val)
+        if numpy.isnan(trial_obj_val):
+            alglogger.debug("Value {} of trial {} is NaN.".format(trial_obj_val,
+                                                                trial.id))
+            return True
 
-        if len(comparison_vals) < self.min_trials:
+        if len(best_objectives) - 1 < self.min_trials:
             return False
 
+        comparison_vals = best_objectives.drop(trial.id).values
+
         if lower_is_better:
             decision = trial_obj_val > numpy.nanmedian(comparison_vals)
         else:
@@ -575,6 +676,28 @@ class MedianStoppingRule(StoppingRule):
 
         return decision
 
+    def _get_trial_summary(self, results):
+        """
+        Last iteration of every trial and lowest/highest objective of every
+        trial that has reached ``min_iterations``.
+
+        The runner checks all active trials against the same results table,
+        so the summary is computed once per table and reused. Only a weak
+        reference to the table is held, like in ``_get_completed``.
+        """
+        if not (self._summary_results is not None
+                and self._summary_results() is results
+                and self._summary_len == len(results)):
+            grouped = results.groupby('Trial-ID', sort=False)
+            max_iterations = grouped['Iteration'].max()
+            eligible = ~(max_iterations < self.min_iterations)
+            self._summary = (max_iterations,
+                             grouped['Objective'].min()[eligible],
+                             grouped['Objective'].max()[eligible])
+            self._summary_results = weakref.ref(results)
+            self._summary_len = len(results)
+        return self._summary
+
 
 def get_sample_results_and_params():
     """
@@ -633,6 +756,9 @@ class PopulationBasedTraining(Algorithm):
         self.generation = 0
         self.count = 0
         self.random_sampler = RandomSearch()
+        self._ordinal_index = {}
+        self._bounds = {}
+        self._sorted_generation = (None, None, None)
 
     def get_suggestion(self, parameters, results, lower_is_better):
         self.count += 1
@@ -665,24 +791,16 @@ class PopulationBasedTraining(Algorithm):
             dict: parameter dictionary.
         """
         # Select correct generation and sort generation members
-        completed = results.loc[results['Status'] == 'COMPLETED', :]
-
+        generation_df = self._get_sorted_generation(results,
+                                                    self.generation - 1,
+                                                    lower_is_better)
 
         if (self.count - 1) % self.population_size / self.population_size < 0.8:
             # Go through top 80% of generation
-            generation_df = completed.loc[(completed.generation
-                                           == self.generation - 1), :] \
-                                     .sort_values(by='Objective',
-                                                  ascending=lower_is_better)
             d = generation_df.iloc[(self.count - 1) % self.population_size].to_dict()
         else:
             # For the rest, sample from top 20% of the last generation
-            target_generations = [self.generation - 1]
-            generation_df = completed.loc[(completed.generation.isin(
-                target_generations)), :] \
-                                     .sort_values(by='Objective',
-                                                  ascending=lower_is_better)
-            idx = sherpa_rng.randint(low=0, high=self.population_size*len(target_generations)//5)
+            idx = sherpa_rng.randint(low=0, high=self.population_size//5)
             d = generation_df.iloc[idx].to_dict()
             d = self._perturb(candidate=d, parameters=parameters)
         trial = {param.name: d[param.name] for param in parameters}
@@ -690,6 +808,25 @@ class PopulationBasedTraining(Algorithm):
             trial[key] = d[key]
         return trial
 
+    def _get_sorted_generation(self, results, generation, lower_is_better):
+        """
+        Returns the completed members of a generation sorted by objective.
+
+        Once all members of the generation have completed the sorted
+        DataFrame is kept and reused for the remaining suggestions of the
+        next generation.
+        """
+        if self._sorted_generation[:2] == (generation, lower_is_better):
+            return self._sorted_generation[2]
+        completed = _get_completed(results)
+        generation_df = completed.loc[(completed.generation == generation), :] \
+                                 .sort_values(by='Objective',
+                                              ascending=lower_is_better)
+        if len(generation_df) >= self.population_size:
+            self._sorted_generation = (generation, lower_is_better,
+                                       generation_df)
+        return generation_df
+
     def _perturb(self, candidate, parameters):
         """
         Randomly perturbs candidate parameters by perturbation factors.
@@ -709,15 +846,19 @@ class PopulationBasedTraining(Algorithm):
                 if isinstance(param, Discrete):
                     candidate[param.name] = int(candidate[param.name])
 
-                candidate[param.name] = numpy.clip(candidate[param.name],
-                                                   min(self.parameter_range.get(param.name) or param.range),
-                                                   max(self.parameter_range.get(param.name) or param.range))
+                lower, upper = _get_bounds(self._bounds, param.name,
+                                           self.parameter_range.get(param.name)
+                                           or param.range)
+                candidate[param.name] = _clip(candidate[param.name],
+                                              lower, upper)
 
             elif isinstance(param, Ordinal):
                 shift = sherpa_rng.choice([-1, 0, +1])
                 values = self.parameter_range.get(param.name) or param.range
-                newidx = values.index(candidate[param.name]) + shift
-                newidx = numpy.clip(newidx, 0, len(values)-1)
+                newidx = _get_ordinal_position(self._ordinal_index, param.name,
+                                               values,
+                                               candidate[param.name]) + shift
+                newidx = _clip(newidx, 0, len(values)-1)
                 candidate[param.name] = values[newidx]
 
             elif isinstance(param, Choice):
@@ -750,14 +891,13 @@ class Genetic(Algorithm):
                                              lower_is_better)
         trial_2_params = self._get_candidate(parameters, results,
                                              lower_is_better)
+        param_by_name = {p.name: p for p in parameters}
         params_values_for_next_trial = {}
         for param_name in trial_1_params.keys():
             param_origin = sherpa_rng.random_sample()  # randomly choose where to get the value from
             if param_origin < self.mutation_rate:  # Use mutation
-                for parameter_object in parameters:
-                    if param_name == parameter_object.name:
-                        params_values_for_next_trial[
-                            param_name] = parameter_object.sample()
+                params_values_for_next_trial[
+                    param_name] = param_by_name[param_name].sample()
             elif (self.mutation_rate <= param_origin and param_origin < self.mutation_rate + (1 - self.mutation_rate) / 2):
                 params_values_for_next_trial[param_name] = trial_1_params[
                     param_name]
@@ -787,11 +927,11 @@ class Genetic(Algorithm):
                 trial_param_values[
                     parameter_object.name] = parameter_object.sample()
             return trial_param_values
-        population = population.sort_values(by='Objective',
-                                            ascending=lower_is_better)
-        idx = sherpa_rng.randint(low=0, high=population.shape[
-                                                   0] // 3)  # pick randomly among top 33%
-        trial_all_values = population.iloc[
+        num_top = population.shape[0] // 3
+        top = (population.nsmallest(num_top, 'Objective') if lower_is_better
+               else population.nlargest(num_top, 'Objective'))
+        idx = sherpa_rng.randint(low=0, high=top.shape[0])  # pick randomly among top 33%
+        trial_all_values = top.iloc[
             idx].to_dict()  # extract the trial values on results table
         trial_param_values = {param.name: trial_all_values[param.name] for param
                               in parameters}  # Select only parameter values
@@ -18,7 +18,6 @@ You should have received a copy of the GNU General Public License
 along with SHERPA.  If not, see <http://www.gnu.org/licenses/>.
 """
 from sherpa.algorithms import Algorithm, RandomSearch
-import numpy
 import pandas
 from sherpa.core import TrialStatus, AlgorithmState
 
@@ -48,13 +47,23 @@ class SuccessiveHalving(Algorithm):
 
     """
     def __init__(self, r=1, R=9, eta=3, s=0, max_finished_configs=50):
+        if not r > 0:
+            raise ValueError("r needs to be greater than 0.")
+        if not eta > 1:
+            raise ValueError("eta needs to be greater than 1.")
         self.eta = eta
         self.r = r
         self.R = R
         self.s = s
         self.rs = RandomSearch()
-        self.number_of_rungs = (numpy.floor(
-            numpy.log(R/r) / numpy.log(eta)) - s).astype('int')
+        # floor(log_eta(R/r)) in integer powers, float logs can round down
+        max_rung = 0
+        while r * eta ** (max_rung + 1) <= R:
+            max_rung += 1
+        self.number_of_rungs = max_rung - s
+        # resource allotted to each rung, computed once up front
+        self.rung_resources = [r * eta ** (s + k)
+                               for k in range(self.number_of_rungs + 1)]
         self.config_counter = 1
         self.promoted_trials = set()
         self.max_finished_configs = max_finished_configs
@@ -74,7 +83,7 @@ class SuccessiveHalving(Algorithm):
         config, k = self.get_job(parameters, results, lower_is_better)
 
         # set new parameters
-        config['resource'] = self.r * self.eta ** (self.s + k)
+        config['resource'] = self.rung_resources[k]
         config['rung'] = k
         config['load_from'] = config.get('save_to', '')
         config['save_to'] = str(self.config_counter)
@@ -87,12 +96,19 @@ class SuccessiveHalving(Algorithm):
         Check to see if there is a promotable configuration. Otherwise,
         return a new configuration.
         """
+        # split completed results by rung once instead of once per rung
+        rung_results = {}
+        if len(results) > 0:
+            completed = results[results.Status == TrialStatus.COMPLETED]
+            rung_results = dict(tuple(completed.groupby('rung')))
+
         for k in reversed(range(self.number_of_rungs)):
-            candidates = self.top_n(parameters,
-                                    results,
-                                    lower_is_better,
-                                    rung=k,
-                                    eta=self.eta)
+            if k not in rung_results:
+                continue
+            candidates = self._top_n_of_rung(parameters,
+                                             rung_results[k],
+                                             lower_is_better,
+                                             eta=self.eta)
             # print("RUNG", k, "CANDIDATES\n", candidates)
             promotable = candidates[~candidates.save_to.isin(
                 self.promoted_trials)].to_dict('records')
@@ -112,13 +128,21 @@ class SuccessiveHalving(Algorithm):
         """
         if len(results) == 0:
             return pandas.DataFrame({'save_to': []})
-        columns = [p.name for p in parameters] + ['save_to']
 
         rung_results = SuccessiveHalving._get_completed_results(results, rung)
+        return SuccessiveHalving._top_n_of_rung(parameters, rung_results,
+                                                lower_is_better, eta)
 
+    @staticmethod
+    def _top_n_of_rung(parameters, rung_results, lower_is_better, eta):
+        """
+        Same as top_n for the completed results of a single rung.
+        """
+        columns = [p.name for p in parameters] + ['save_to']
         n = len(rung_results) // eta
-        top_n = rung_results.sort_values(by="Objective",
-                                         ascending=lower_is_better) \
-                            .iloc[0:n, :] \
-                            .loc[:, columns]
-        return top_n
+        # partial selection of the n best, no need to sort the whole rung
+        if lower_is_better:
+            top_n = rung_results.nsmallest(n, "Objective")
+        else:
+            top_n = rung_results.nlargest(n, "Objective")
+        return top_n.loc[:, columns]
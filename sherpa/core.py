@@ -31,7 +31,7 @@ import warnings
 import contextlib
 import shlex
 from .database import _Database
-from .schedulers import _JobStatus
+from .schedulers import _JobStatus, _makedirs
 import datetime
 try:
     import cPickle as pickle
@@ -620,8 +620,7 @@ def optimize(parameters, algorithm, lower_is_better,
         mongodb_args (dict[str, any]): arguments to MongoDB beyond port, dir,
             and log-path. Keys are the argument name without "--".
     """
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    _makedirs(output_dir)
 
     if not scheduler.output_dir:
         scheduler.output_dir = output_dir
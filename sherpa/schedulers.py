@@ -21,12 +21,25 @@ import subprocess
 import re
 import sys
 import os
+import errno
 import logging
 
 
 logger = logging.getLogger(__name__)
 
 
+def _makedirs(path):
+    """
+    Creates ``path`` and its parents unless it already exists, also if
+    another process creates it at the same time.
+    """
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST or not os.path.isdir(path):
+            raise
+
+
 class _JobStatus(object):
     """
     Job status used internally to classify jobs into categories.
@@ -109,8 +122,7 @@ class LocalScheduler(Scheduler):
 
     def submit_job(self, command, env={}, job_name=''):
         outdir = os.path.join(self.output_dir, 'jobs')
-        if not os.path.isdir(outdir):
-            os.mkdir(outdir)
+        _makedirs(outdir)
             
         env.update(os.environ.copy())
         if self.resources is not None:
@@ -120,7 +132,14 @@ class LocalScheduler(Scheduler):
             
         f = open(os.path.join(outdir, '{}.out'.format(job_name)), 'w')
         optns = self.submit_options.split(' ') if self.submit_options else []
-        process = subprocess.Popen(optns + command, env=env, stderr=f, stdout=f)
+        try:
+            process = subprocess.Popen(optns + command, env=env, stderr=f, stdout=f)
+        except Exception:
+            # The job never started, so release its resource right away.
+            f.close()
+            if self.resources is not None:
+                self.resources.append(env['SHERPA_RESOURCE'])
+            raise
         self.jobs[process.pid] = process
         self.output_files[process.pid] = f
         if self.resources is not None:
@@ -189,8 +208,7 @@ class SGEScheduler(Scheduler):
     def submit_job(self, command, env={}, job_name=''):
         # Create temp directory.
         outdir = os.path.join(self.output_dir, 'jobs')
-        if not os.path.isdir(outdir):
-            os.mkdir(outdir)
+        _makedirs(outdir)
 
         job_name = job_name or str(self.count)
         sgeoutfile = os.path.join(outdir, '{}.out'.format(job_name))
@@ -322,8 +340,7 @@ class SLURMScheduler(Scheduler):
         logger.info('\nSUBMITTING JOB in submit_job')
 
         outdir = os.path.join(self.output_dir, 'jobs')
-        if not os.path.isdir(outdir):
-            os.mkdir(outdir)
+        _makedirs(outdir)
 
         job_name = job_name or str(self.count)
         slurmoutfile = os.path.join(outdir, '{}.out'.format(job_name))
@@ -24,6 +24,7 @@ import numpy
 import sherpa
 import logging
 import itertools
+import weakref
 import pytest
 from testing_utils import *
 
@@ -57,6 +58,105 @@ def test_median_stopping_rule():
                                          lower_is_better=True)
 
 
+def test_median_stopping_rule_reuses_trial_summary():
+    results_df = pandas.DataFrame(collections.OrderedDict(
+        [('Trial-ID', [1]*3 + [2]*3 + [3]*3),
+         ('Status', ['INTERMEDIATE']*9),
+         ('Iteration', [1, 2, 3]*3),
+         ('Objective', [0.1]*3 + [0.2]*3 + [0.3]*3)]
+    ))
+
+    stopper = sherpa.algorithms.MedianStoppingRule(min_iterations=2,
+                                                   min_trials=1)
+    summary = stopper._get_trial_summary(results_df)
+    assert stopper._get_trial_summary(results_df) is summary
+
+    assert not stopper.should_trial_stop(trial=get_test_trial(id=1),
+                                         results=results_df,
+                                         lower_is_better=True)
+    assert stopper.should_trial_stop(trial=get_test_trial(id=3),
+                                     results=results_df,
+                                     lower_is_better=True)
+    assert stopper._get_trial_summary(results_df) is summary
+
+    # a new results table, e.g. after an observation was added, is re-read
+    results_df = results_df.iloc[:6]
+    assert not stopper.should_trial_stop(trial=get_test_trial(id=3),
+                                         results=results_df,
+                                         lower_is_better=True)
+    assert stopper._get_trial_summary(results_df) is not summary
+
+    # the summary does not keep the last results table alive
+    results_ref = weakref.ref(results_df)
+    del results_df
+    assert results_ref() is None
+
+
+def test_get_completed_reuses_rows():
+    from sherpa.algorithms.core import _get_completed
+    results_df = pandas.DataFrame({'Trial-ID': [1, 1, 2],
+                                   'Status': ['INTERMEDIATE', 'COMPLETED',
+                                              'COMPLETED'],
+                                   'Objective': [0.1, 0.2, 0.3]})
+    completed = _get_completed(results_df)
+    assert list(completed['Trial-ID']) == [1, 2]
+    assert _get_completed(results_df) is completed
+
+    other_df = results_df.iloc[:2]
+    assert list(_get_completed(other_df)['Trial-ID']) == [1]
+
+    # the cache does not keep the last results table alive
+    results_ref = weakref.ref(other_df)
+    del other_df
+    assert results_ref() is None
+
+
+def test_get_ordinal_position():
+    from sherpa.algorithms.core import _get_ordinal_position
+    cache = {}
+    assert _get_ordinal_position(cache, 'a', [1, 2, 3], 2) == 1
+    assert _get_ordinal_position(cache, 'a', [1, 2, 3], 3) == 2
+    with pytest.raises(ValueError):
+        _get_ordinal_position(cache, 'a', [1, 2, 3], 4)
+
+    arch = [[10], [10, 10], [10, 10, 10]]
+    assert _get_ordinal_position(cache, 'arch', arch, [10, 10]) == 1
+    with pytest.raises(ValueError):
+        _get_ordinal_position(cache, 'arch', arch, [20])
+
+
+def test_clip_keeps_value_type():
+    from sherpa.algorithms.core import _clip
+    assert _clip(0.5, 0, 1) == 0.5
+    for value, expected in [(1.3, 1.), (-0.2, 0.)]:
+        clipped = _clip(value, 0, 1)
+        assert clipped == expected and isinstance(clipped, float)
+    assert isinstance(_clip(numpy.float64(1.3), 0, 1), numpy.float64)
+    assert _clip(12, 0, 10) == 10
+    # an int is not truncated back into the range
+    assert _clip(5, 0, 2.5) == 2.5
+    assert _clip(-1, -0.5, 2) == -0.5
+
+    alg = sherpa.algorithms.LocalSearch(seed_configuration={'x': 2},
+                                        perturbation_factors=(1, 2))
+    perturbed = alg._perturb({'x': 2}, sherpa.Continuous('x', [0, 2.5]),
+                             increase=True)
+    assert perturbed == {'x': 2.5}
+
+
+def test_perturbed_continuous_stays_float_at_integer_bound():
+    parameter = sherpa.Continuous('p', [0, 1])
+    alg = sherpa.algorithms.LocalSearch(seed_configuration={'p': 0.9},
+                                        perturbation_factors=(0.5, 2.))
+    perturbed = alg._perturb({'p': 0.9}, parameter, increase=True)
+    assert perturbed['p'] == 1. and isinstance(perturbed['p'], float)
+
+    pbt = sherpa.algorithms.PopulationBasedTraining(
+        num_generations=2, perturbation_factors=(2.,))
+    perturbed = pbt._perturb({'p': 0.9}, [parameter])
+    assert perturbed['p'] == 1. and isinstance(perturbed['p'], float)
+
+
 def get_local_search_study_lower_is_better(params, seed):
     alg = sherpa.algorithms.LocalSearch(seed_configuration=seed)
 
@@ -99,6 +199,21 @@ class TestLocalSearch:
 
         assert study.get_best_result()['Objective'] in expected
 
+    def test_list_valued_choice(self):
+        parameters = [sherpa.Choice('arch', [[10, 10], [20, 5], [20, 10]]),
+                      sherpa.Continuous('lr', [0.01, 0.1])]
+        seed = {'arch': [10, 10], 'lr': 0.05}
+        alg = sherpa.algorithms.LocalSearch(seed_configuration=seed)
+        results = pandas.DataFrame()
+
+        assert alg.get_suggestion(parameters, results, True) == seed
+        suggestions = [alg.get_suggestion(parameters, results, True)
+                       for _ in range(4)]
+        assert sorted(s['arch'] for s in suggestions
+                      if s['lr'] == 0.05) == [[20, 5], [20, 10]]
+        assert seed not in suggestions
+        assert alg.get_suggestion(parameters, results, True) is None
+
     @pytest.mark.parametrize("param1,seed1,param2,seed2", [(sherpa.Ordinal('p1', [0, 1, 2, 3, 4]), {'p1': 2},
                                                             sherpa.Continuous('p2', [0, 1]), {'p2': 0.5})])
     def test_only_one_parameter_is_perturbed_at_a_time(self, param1, seed1, param2, seed2):
@@ -304,6 +419,27 @@ def test_pbt_ordinal():
                        status='COMPLETED')
 
 
+def test_pbt_sorted_generation_is_cached():
+    algorithm = sherpa.algorithms.PopulationBasedTraining(num_generations=2,
+                                                          population_size=3)
+    results_df = pandas.DataFrame({'Status': ['COMPLETED']*3,
+                                   'generation': [1]*3,
+                                   'Objective': [0.3, 0.1, 0.2]})
+
+    # incomplete generations are not cached
+    partial = algorithm._get_sorted_generation(results_df.iloc[:2], 1, True)
+    assert list(partial['Objective']) == [0.1, 0.3]
+    assert algorithm._get_sorted_generation(results_df.iloc[:2], 1,
+                                            True) is not partial
+
+    generation_df = algorithm._get_sorted_generation(results_df, 1, True)
+    assert list(generation_df['Objective']) == [0.1, 0.2, 0.3]
+    assert algorithm._get_sorted_generation(results_df, 1,
+                                            True) is generation_df
+    assert list(algorithm._get_sorted_generation(
+        results_df, 1, False)['Objective']) == [0.3, 0.2, 0.1]
+
+
 def test_genetic():
     """
     Since genetic algorithms are stochastic we will check for average improvements while testing new configurations
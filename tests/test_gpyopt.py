@@ -3,8 +3,9 @@ import pandas
 import pytest
 import numpy
 import collections
+import GPy
 import GPyOpt as gpyopt_package
-from sherpa.algorithms.bayesian_optimization import GPyOpt
+from sherpa.algorithms.bayesian_optimization import GPyOpt, ChoiceTransform
 from sherpa.algorithms import Repeat
 
 
@@ -119,6 +120,30 @@ def test_transformation_to_gpyopt_domain_log_discrete():
         GPyOpt._initialize_domain(parameters)
 
 
+def test_choice_transform_list_valued_range():
+    transform = ChoiceTransform(
+        sherpa.Choice('arch', [[20, 5], [20, 10], [10, 10, 10]]))
+    assert list(transform.sherpa_format_to_gpyopt_design_format(
+        [[20, 10], [10, 10, 10]])) == [1, 2]
+
+    transform = ChoiceTransform(
+        sherpa.Choice('arch', [(20, 5), (20, 10), (10, 10, 10)]))
+    assert list(transform.sherpa_format_to_gpyopt_design_format(
+        pandas.Series([(20, 10), (10, 10, 10)]))) == [1, 2]
+
+
+def test_choice_transform_duplicate_range():
+    transform = ChoiceTransform(sherpa.Choice('a', ['x', 'y', 'x']))
+    assert list(transform.sherpa_format_to_gpyopt_design_format(
+        pandas.Series(['y', 'x']))) == [1, 0]
+
+
+def test_choice_transform_unknown_value():
+    transform = ChoiceTransform(sherpa.Choice('a', ['x', 'y']))
+    with pytest.raises(ValueError):
+        transform.sherpa_format_to_gpyopt_design_format(pandas.Series(['z']))
+
+
 def test_transformation_to_gpyopt_domain_with_multiple_parameters(parameters):
     domain = GPyOpt._initialize_domain(parameters)
 
@@ -143,6 +168,39 @@ def test_prepare_data_for_bayes_opt(parameters, results):
     assert numpy.array_equal(y, numpy.array([[0.1], [0.055], [0.15]]))
 
 
+def test_get_data_for_bayes_opt_is_incremental(parameters, results):
+    gpyopt = GPyOpt()
+    X, y, y_var = gpyopt._get_data_for_bayes_opt(parameters, results.iloc[:2])
+    assert X.shape == (2, 4)
+
+    X, y, y_var = gpyopt._get_data_for_bayes_opt(parameters, results)
+    X_full, y_full, _ = GPyOpt._prepare_data_for_bayes_opt(parameters, results)
+    assert numpy.array_equal(X, X_full)
+    assert numpy.array_equal(y, y_full)
+
+    # previously seen trials changed, so the matrix is rebuilt
+    reordered = results.iloc[::-1]
+    X, y, y_var = gpyopt._get_data_for_bayes_opt(parameters, reordered)
+    X_full, _, _ = GPyOpt._prepare_data_for_bayes_opt(parameters, reordered)
+    assert numpy.array_equal(X, X_full)
+
+
+def test_get_model_options_warm_starts_kernel():
+    gpyopt = GPyOpt()
+    assert gpyopt._get_model_options(100) == {}
+
+    gpyopt._kernel = GPy.kern.Matern52(2)
+    assert gpyopt._get_model_options(
+        gpyopt.warm_start_num_data_points - 1) == {}
+
+    options = gpyopt._get_model_options(gpyopt.warm_start_num_data_points)
+    assert options['optimize_restarts'] == 1
+    assert options['kernel'] is not gpyopt._kernel
+
+    gpyopt.model_type = 'GP_MCMC'
+    assert gpyopt._get_model_options(100) == {}
+
+
 def test_reverse_format(parameters, results):
     X, y, y_var = GPyOpt._prepare_data_for_bayes_opt(parameters,
                                                      results)
@@ -154,6 +212,8 @@ def test_reverse_format(parameters, results):
                              'num_hidden': 222}
     assert reversed_X[2] == {'dropout': 0.33, 'lr': 1e-2, 'activation': 'sigmoid',
                              'num_hidden': 288}
+    assert all(isinstance(x['num_hidden'], (int, numpy.integer))
+               for x in reversed_X)
 
 
 def test_bayesopt_batch(parameters, results):
@@ -194,6 +254,32 @@ def test_get_best_pred(lower_is_better,expected_best):
     assert best_params['x'] == expected_best
 
 
+def test_get_best_pred_is_cached(monkeypatch):
+    results = pandas.DataFrame({'x': numpy.linspace(0, 1, 10),
+                                'Objective': numpy.linspace(0, 1, 10),
+                                'Status': ['COMPLETED']*10})
+    params = [sherpa.Continuous('x', [0, 1])]
+    algorithm = GPyOpt(num_initial_data_points=2)
+    algorithm._num_initial_data_points = 2
+
+    calls = []
+    def generate_best_predicted(X, y, lower_is_better, domain):
+        calls.append(len(X))
+        return X[:1]
+    monkeypatch.setattr(algorithm, '_generate_best_predicted',
+                        generate_best_predicted)
+
+    algorithm.get_best_pred(params, results, True)
+    algorithm.get_best_pred(params, results, True)
+    assert calls == [10]
+
+    algorithm.get_best_pred(params, results, False)
+    assert calls == [10, 10]
+
+    algorithm.get_best_pred(params, results.iloc[:5], False)
+    assert calls == [10, 10, 5]
+
+
 @pytest.mark.skip(reason="sample results do not copy when doing `pip install .`")
 def test_overall():
     gpyopt = GPyOpt(max_concurrent=1)
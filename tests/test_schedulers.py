@@ -139,4 +139,25 @@ def test_local_scheduler_resources(test_dir):
         for id in job_ids:
             assert s.get_status(id) in [sherpa.schedulers._JobStatus.finished, sherpa.schedulers._JobStatus.other]
         
-        assert len(s.resources) == 4*multiple
\ No newline at end of file
+        assert len(s.resources) == 4*multiple
+
+def test_local_scheduler_resources_released_on_failed_submit(test_dir):
+    s = sherpa.schedulers.LocalScheduler(resources=[0, 1], output_dir=test_dir)
+
+    with pytest.raises(OSError):
+        s.submit_job([os.path.join(test_dir, "does-not-exist")])
+
+    assert sorted(map(str, s.resources)) == ['0', '1']
+    assert len(s.resource_by_job) == 0
+
+
+def test_makedirs_existing_dir(test_dir):
+    path = os.path.join(test_dir, 'jobs', 'nested')
+    sherpa.schedulers._makedirs(path)
+    sherpa.schedulers._makedirs(path)
+    assert os.path.isdir(path)
+
+    filepath = os.path.join(test_dir, 'somefile')
+    open(filepath, 'w').close()
+    with pytest.raises(OSError):
+        sherpa.schedulers._makedirs(filepath)
@@ -250,5 +250,25 @@ def test_max_configs():
     assert len(completed.loc[completed.rung == 2, :]) == 5
 
 
+def test_rung_resources():
+    """
+    Resources per rung are r * eta ** (s + k) for every rung k.
+    """
+    algorithm = successive_halving.SuccessiveHalving(r=1, R=27, eta=3, s=1)
+    assert algorithm.number_of_rungs == 2
+    assert algorithm.rung_resources == [3, 9, 27]
+
+    # log(216)/log(6) evaluates to slightly below 3 in floating point
+    algorithm = successive_halving.SuccessiveHalving(r=1, R=216, eta=6, s=0)
+    assert algorithm.number_of_rungs == 3
+    assert algorithm.rung_resources == [1, 6, 36, 216]
+
+
+@pytest.mark.parametrize('r,eta', [(1, 1), (1, 0.5), (0, 3), (-1, 3)])
+def test_invalid_rung_arguments(r, eta):
+    with pytest.raises(ValueError):
+        successive_halving.SuccessiveHalving(r=r, R=9, eta=eta)
+
+
 if __name__ == '__main__':
     test_no_stragglers_lower_is_better()
\ No newline at end of file